@@ -1,5 +1,7 @@
 import json
-from contextlib import contextmanager
+import struct
+import asyncio
+from collections import deque
 from time import perf_counter
 from random import randint, choice
 
@@ -8,6 +10,13 @@ import pygame
 import net
 
 
+# Wire format of a position update: b"P" tag + two little-endian int16s
+POSITION_STRUCT = struct.Struct("<hh")
+
+# Wire format of one snapshot record: player id + x + y
+SNAPSHOT_STRUCT = struct.Struct("<Hff")
+
+
 COLORS = {
     "Red": (255, 0, 0),
     "Orange": (255, 128, 0),
@@ -25,28 +34,84 @@ class Player:
         self.color = COLORS[color_key]
         self.name = f"Player{color_key}{randint(100, 999)}"
 
-    def draw(self, game: "Game", other: bool = False) -> None:
-        player_rect = pygame.Rect(self.position, self.size)
-        pygame.draw.rect(game.display, (0, 0, 0), player_rect.inflate(2, 2))
-        pygame.draw.rect(game.display, self.color, player_rect)
+        # Body & name tag surfaces are rendered once and reused; rebuilt
+        # only if the name or color changes (remote players get theirs
+        # assigned after construction).
+        self._cache_key = None
+        self._body_surf = None
+        self._tag_surf = None
+        self._text_width = 0
+
+    def _build_surfaces(self, game: "Game", other: bool) -> None:
+        # 30x30 body with the 1 px black border baked in
+        body = pygame.Surface((self.size[0] + 2, self.size[1] + 2))
+        body.fill((0, 0, 0))
+        pygame.draw.rect(body, self.color, (1, 1, *self.size))
 
         name_col = (0, 0, 0) if not other else (160, 160, 160)
         name_surf = game.fonts["NotoSans"].render(self.name, True, name_col)
-        name_pos = pygame.Vector2(self.position.x - (name_surf.width / 2 - self.size[0] / 2), self.position.y - 30)
-        game.display.blit(name_surf, name_pos)
+        tag = pygame.Surface(name_surf.get_rect().inflate(8, 4).size, pygame.SRCALPHA)
+        tag.blit(name_surf, (4, 2))
+        pygame.draw.rect(tag, name_col, tag.get_rect(), 1, border_radius=7)
 
-        border_rect = name_surf.get_rect().inflate(8, 4)
-        border_rect.topleft += name_pos
-        pygame.draw.rect(game.display, name_col, border_rect, 1, border_radius=7)
+        self._cache_key = (self.name, self.color, other)
+        self._body_surf = body
+        self._tag_surf = tag
+        self._text_width = name_surf.width
+
+    def draw(self, game: "Game", batch: list, other: bool = False) -> None:
+        if self._cache_key != (self.name, self.color, other):
+            self._build_surfaces(game, other)
+
+        x, y = self.position
+        batch.append((self._body_surf, (x - 1, y - 1)))
+        batch.append((self._tag_surf, (x - (self._text_width / 2 - self.size[0] / 2) - 4, y - 32)))
 
     def serialize(self) -> str:
         return json.dumps({"name": self.name, "color": self.color})
 
 
-def interpolate(x1: float, x2: float, y1: float, y2: float, x: float):
-    """ Perform linear interpolation for x between (x1,y1) and (x2,y2) """
+class _Stat:
+    """
+    Rolling profiling stat over a fixed sample window.
+    """
+
+    __slots__ = ("acc", "avg", "min", "max", "sum", "index", "minq", "maxq")
+
+    def __init__(self, maxlen: int) -> None:
+        self.acc = deque(maxlen=maxlen)
+        self.avg = 0.0
+        self.min = 0.0
+        self.max = 0.0
+        self.sum = 0.0
+        self.index = 0
+        # Monotonic deques of (value, index) for sliding-window min & max
+        self.minq = deque()
+        self.maxq = deque()
+
 
-    return ((y2 - y1) * x + x2 * y1 - x1 * y2) / (x2 - x1)
+class _Profiler:
+    """
+    Reusable profiling context manager.
+
+    One preallocated instance per stat, so entering a profile block
+    allocates nothing (a generator-based contextmanager would build a
+    fresh generator on every with-statement).
+    """
+
+    __slots__ = ("_game", "_stat", "_start", "_pc")
+
+    def __init__(self, game: "Game", stat: str) -> None:
+        self._game = game
+        self._stat = stat
+        self._start = 0.0
+        self._pc = perf_counter
+
+    def __enter__(self) -> None:
+        self._start = self._pc()
+
+    def __exit__(self, *args) -> None:
+        self._game.accumulate(self._stat, self._pc() - self._start)
 
 
 class Game:
@@ -63,6 +128,9 @@ class Game:
         self.clock = pygame.time.Clock()
         self.is_running = False
 
+        # Bound once so hot paths skip the module attribute lookup
+        self._pc = perf_counter
+
         self.max_fps = 60
         self.fps = self.max_fps
         self.dt = 1.0 / self.fps
@@ -79,14 +147,12 @@ class Game:
         self.sdl_version = ".".join((str(v) for v in pygame.get_sdl_version()))
 
         # Profiling stuff
+        self.stat_accumulate = 30
         self.stats = {
-            "render": {"avg": 0.0, "min": 0.0, "max": 0.0, "acc": []},
-            "tick": {"avg": 0.0, "min": 0.0, "max": 0.0, "acc": []},
-            "network": {"avg": 0.0, "min": 0.0, "max": 0.0, "acc": []},
-            "frame": {"avg": 0.0, "min": 0.0, "max": 0.0, "acc": []},
-            "fps": {"avg": 0.0, "min": 0.0, "max": 0.0, "acc": []}
+            stat: _Stat(self.stat_accumulate)
+            for stat in ("render", "tick", "network", "frame", "fps")
         }
-        self.stat_accumulate = 30
+        self._profilers = {stat: _Profiler(self, stat) for stat in self.stats}
         self.stat_drawing = 1
 
         self.player = Player()
@@ -97,7 +163,27 @@ class Game:
         self.server_last_tick = 0
         self.interpolation = False
 
+        # Key constants cached for the per-frame movement code
+        self._K_a = pygame.K_a
+        self._K_d = pygame.K_d
+        self._K_w = pygame.K_w
+        self._K_s = pygame.K_s
+
+        # Scratch rect reused by the interpolation draw loop
+        self._draw_rect = pygame.Rect(0, 0, 30, 30)
+
+        # Rendered HUD line surfaces, keyed by line index; the first
+        # element is the rounded-value key from _hud_stat_key
+        self._hud_cache: dict[int, tuple[tuple, pygame.Surface]] = {}
+
+        # Outgoing position updates are coalesced to the server tick rate
+        self._last_sent_xy = None
+        self._send_interval = 1.0 / 60.0
+        self._last_send = 0.0
+
         self.client = net.TCPClient("127.0.0.1", 65432)
+        # The HUD shows connection timings, so keep profiling on here
+        self.client._profile = True
 
         self.client.register(self.on_connect)
         self.client.register(self.on_disconnect)
@@ -107,7 +193,7 @@ class Game:
 
     def on_connect(self):
         print(f"Successfully connected to {self.client.host}:{self.client.port}")
-        self.client._outgoing.put(f"_{self.player.serialize()}".encode())
+        self.client.send_raw(f"_{self.player.serialize()}".encode())
 
     def on_disconnect(self):
         print("Disconnected")
@@ -115,9 +201,10 @@ class Game:
         self.is_running = False
 
     def on_packet(self, packet: net.common.Packet):
-        data = packet.data.decode()
+        data = packet.data
 
-        if data.startswith("_"):
+        # Player metadata is rare, so it stays JSON
+        if data.startswith(b"_"):
             deserialized = json.loads(data[1:])
             id_ = int(deserialized["id"])
             self.players[id_] = Player()
@@ -125,50 +212,83 @@ class Game:
             self.players[id_].color = deserialized["color"]
             print(f"Client#{id_} data received: {self.players[id_].name}")
 
-        else:
-            self.server_last_tick = perf_counter() - self.server_tick
-            self.server_tick = perf_counter()
-
-            self.player_poss0.clear()
-            for pos in self.player_poss: self.player_poss0.append(pos)
+        elif data.startswith(b"P"):
+            now = self._pc()
+            self.server_last_tick = now - self.server_tick
+            self.server_tick = now
 
+            # Swap buffers instead of copying element by element; the old
+            # positions become the interpolation start points by rebinding.
+            self.player_poss0, self.player_poss = self.player_poss, self.player_poss0
             self.player_poss.clear()
 
-            jsondata = json.loads(data)
-
-            for id_ in jsondata:
-                pid = int(id_)
+            for pid, x, y in SNAPSHOT_STRUCT.iter_unpack(data[1:]):
+                player = self.players.get(pid)
                 # Player data has not yet received
-                if pid not in self.players: continue
+                # (this also skips this client's own entry)
+                if player is None: continue
 
-                pos = jsondata[id_]
-                x, y = float(pos[0]), float(pos[1])
-                self.players[pid].position = pygame.Vector2(x, y)
+                # Mutate the existing vector, no allocation per player
+                player.position.x = x
+                player.position.y = y
+                self.player_poss.append((x, y))
 
-    @contextmanager
-    def profile(self, stat: str):
+    def profile(self, stat: str) -> _Profiler:
         """ Profile code. """
 
-        start = perf_counter()
-        
-        try: yield None
+        return self._profilers[stat]
+
+    def _hud_stat_key(self, stat: str) -> tuple:
+        """ Rounded values displayed on a stat HUD line. """
+
+        s = self.stats[stat]
+        return (round(s.avg * 1000, 1), round(s.min * 1000, 2), round(s.max * 1000, 2))
 
-        finally:
-            elapsed = perf_counter() - start
-            self.accumulate(stat, elapsed)
+    def _hud_line(self, i: int, key: tuple) -> str:
+        """ Build the HUD line text from its rounded values. """
+
+        if i == 0: return "         avg    lo     hi"
+        elif i == 1: return f"FPS:     {key[0]}    {key[1]}    {key[2]}"
+        elif i == 2: return f"Frame:   {key[0]}    {key[1]}    {key[2]} ms"
+        elif i == 3: return f"Render:  {key[0]}    {key[1]}    {key[2]} ms"
+        elif i == 4: return f"Tick:    {key[0]}    {key[1]}    {key[2]} ms"
+        elif i == 5: return f"Network: {key[0]}    {key[1]}    {key[2]} ms"
+        elif i == 6: return f"Latency: {key[0]}ms"
+        elif i == 7: return f"Connection: L={key[0]}ms P={key[1]}ms S={key[2]}ms"
+        else: return f"Interpolation: {('disabled', 'enabled')[key[0]]}"
 
     def accumulate(self, stat: str, value: float) -> None:
         """ Accumulate stat value. """
 
-        acc = self.stats[stat]["acc"]
+        s = self.stats[stat]
+        acc = s.acc
+
+        # Maintain a running sum instead of re-summing the whole window,
+        # the deque evicts the oldest value on its own once full.
+        if len(acc) == acc.maxlen:
+            s.sum += value - acc[0]
+        else:
+            s.sum += value
+
         acc.append(value)
 
-        if len(acc) > self.stat_accumulate:
-            acc.pop(0)
+        index = s.index = s.index + 1
+        oldest = index - acc.maxlen
+
+        # Classic sliding-window minimum/maximum with monotonic deques
+        minq, maxq = s.minq, s.maxq
+
+        while minq and minq[-1][0] >= value: minq.pop()
+        minq.append((value, index))
+        while minq[0][1] <= oldest: minq.popleft()
 
-            self.stats[stat]["avg"] = sum(acc) / len(acc)
-            self.stats[stat]["min"] = min(acc)
-            self.stats[stat]["max"] = max(acc)
+        while maxq and maxq[-1][0] <= value: maxq.pop()
+        maxq.append((value, index))
+        while maxq[0][1] <= oldest: maxq.popleft()
+
+        s.avg = s.sum / len(acc)
+        s.min = minq[0][0]
+        s.max = maxq[0][0]
 
     def handle_events(self) -> None:
         """ Handle Pygame events. """
@@ -195,6 +315,24 @@ class Game:
         while self.is_running:
             self.frame()
 
+    async def run_async(self) -> None:
+        """
+        Run the game under an asyncio event loop (pygbag / web builds).
+
+        Awaits the remainder of the frame budget instead of a bare
+        sleep(0) every frame, so the host loop gets one useful slice per
+        frame rather than 165 no-op wakeups a second. The clock.tick
+        inside frame() then has nothing left to wait for.
+        """
+
+        self.is_running = True
+        target_dt = 1.0 / self.max_fps
+
+        while self.is_running:
+            frame_start = self._pc()
+            self.frame()
+            await asyncio.sleep(max(0.0, target_dt - (self._pc() - frame_start)))
+
     def frame(self) -> None:
         """ One game frame. """
 
@@ -204,7 +342,8 @@ class Game:
             if self.fps == float("inf"): self.fps = 0
             self.accumulate("fps", self.fps)
 
-            self.mouse = pygame.Vector2(*pygame.mouse.get_pos())
+            # Mutate the preallocated vector instead of allocating a new one
+            self.mouse.xy = pygame.mouse.get_pos()
             self.events = pygame.event.get()
             self.handle_events()
 
@@ -212,9 +351,21 @@ class Game:
                 self.update()
 
             with self.profile("network"):
-                x, y = int(self.player.position.x), int(self.player.position.y)
-                #self.client.send_raw(f"{x},{y}".encode())
-                self.client._outgoing.put(f"{x},{y}".encode())
+                # Only enqueue when the position actually changed, at most
+                # once per server tick. The server only cares about the
+                # latest state, intermediate positions are dead data.
+                # Movement is unbounded, so clamp to the int16 wire range;
+                # pack would raise on a far off-screen coordinate otherwise
+                xy = (
+                    min(32767, max(-32768, int(self.player.position.x))),
+                    min(32767, max(-32768, int(self.player.position.y)))
+                )
+                now = self._pc()
+
+                if xy != self._last_sent_xy and now - self._last_send >= self._send_interval:
+                    self.client.send_raw(b"P" + POSITION_STRUCT.pack(*xy))
+                    self._last_sent_xy = xy
+                    self._last_send = now
 
             with self.profile("render"):
                 self.render()
@@ -223,41 +374,49 @@ class Game:
         """ Update one tick frame. """
 
         keys = pygame.key.get_pressed()
-        speed = 300
+        speed_dt = 300 * self.dt
 
-        if keys[pygame.K_a]: self.player.position.x -= speed * self.dt
-        if keys[pygame.K_d]: self.player.position.x += speed * self.dt
-        if keys[pygame.K_w]: self.player.position.y -= speed * self.dt
-        if keys[pygame.K_s]: self.player.position.y += speed * self.dt
+        # Key states are 0/1 ints, so the movement is branch-free
+        self.player.position.x += (keys[self._K_d] - keys[self._K_a]) * speed_dt
+        self.player.position.y += (keys[self._K_s] - keys[self._K_w]) * speed_dt
 
     def render(self) -> None:
         """ Render one game frame. """
         
         self.display.fill((255, 255, 255))
 
-        self.player.draw(self)
-        
+        # All player bodies and name tags go out in one batched blits()
+        # call instead of several draw.rect/font.render calls per entity.
+        batch = []
+        self.player.draw(self, batch)
+
         if self.interpolation:
             if len(self.player_poss) == len(self.player_poss0):
-                for i, pos in enumerate(self.player_poss):
-                    pos0 = pygame.Vector2(*self.player_poss0[i])
-                    pos = pygame.Vector2(*pos)
-
-                    dir = pos - pos0
-                    dist = dir.length()
+                # One timestamp for all players, it doesn't change
+                # meaningfully across a few microseconds of iteration.
+                elapsed = self._pc()
 
-                    if dist != 0:
-                        t0 = self.server_tick
-                        t1 = self.server_tick + self.server_last_tick
-                        #print(self.server_last_tick)
+                # The general interpolator collapses algebraically to a
+                # single scalar t, the distance and its sqrt cancel out.
+                last_tick = self.server_last_tick
+                t = (elapsed - self.server_tick) / last_tick if last_tick else 0.0
 
-                        elapsed = perf_counter()
+                # Hoist attribute lookups and constants out of the loop
+                draw_rect = pygame.draw.rect
+                display = self.display
+                red = (255, 0, 0)
+                rect = self._draw_rect
 
-                        curr_dist = interpolate(t0, t1, 0, dist, elapsed)
+                for i, pos in enumerate(self.player_poss):
+                    # Plain float math, no Vector2 allocations in the loop
+                    x0, y0 = self.player_poss0[i]
+                    x1, y1 = pos
 
-                        pos0 += dir.normalize() * curr_dist
+                    x0 += (x1 - x0) * t
+                    y0 += (y1 - y0) * t
 
-                    pygame.draw.rect(self.display, (255, 0, 0), (pos0, (30, 30)))
+                    rect.topleft = (x0, y0)
+                    draw_rect(display, red, rect)
 
         else:
             #for pos in self.player_poss:
@@ -265,23 +424,37 @@ class Game:
 
             for id_ in self.players:
                 player = self.players[id_]
-                player.draw(self, other=True)
-
-        lines = (
-            f"         avg    lo     hi",
-            f"FPS:     {round(self.stats['fps']['avg'])}    {round(self.stats['fps']['min'])}    {round(self.stats['fps']['max'])}",
-            f"Frame:   {round(self.stats['frame']['avg'] * 1000, 1)}    {round(self.stats['frame']['min'] * 1000, 2)}    {round(self.stats['frame']['max'] * 1000, 2)} ms",
-            f"Render:  {round(self.stats['render']['avg'] * 1000, 1)}    {round(self.stats['render']['min'] * 1000, 2)}    {round(self.stats['render']['max'] * 1000, 2)} ms",
-            f"Tick:    {round(self.stats['tick']['avg'] * 1000, 1)}    {round(self.stats['tick']['min'] * 1000, 2)}    {round(self.stats['tick']['max'] * 1000, 2)} ms",
-            f"Network: {round(self.stats['network']['avg'] * 1000, 1)}    {round(self.stats['network']['min'] * 1000, 2)}    {round(self.stats['network']['max'] * 1000, 2)} ms",
-            f"Latency: {round(self.client.latency * 1000, 2)}ms",
-            f"Connection: L={round(self.client.connection_profile.listener_time * 1000, 2)}ms "
-            f"P={round(self.client.connection_profile.processer_time * 1000, 2)}ms "
-            f"S={round(self.client.connection_profile.sender_time * 1000, 2)}ms",
-            f"Interpolation: {('disabled', 'enabled')[self.interpolation]}"
+                player.draw(self, batch, other=True)
+
+        self.display.blits(batch, doreturn=False)
+
+        connection = self.client.connection_profile
+        keys = (
+            (),
+            (round(self.stats["fps"].avg), round(self.stats["fps"].min), round(self.stats["fps"].max)),
+            self._hud_stat_key("frame"),
+            self._hud_stat_key("render"),
+            self._hud_stat_key("tick"),
+            self._hud_stat_key("network"),
+            (round(self.client.latency * 1000, 2),),
+            (round(connection.listener_time * 1000, 2),
+             round(connection.processer_time * 1000, 2),
+             round(connection.sender_time * 1000, 2)),
+            (self.interpolation,)
         )
-        for i, line in enumerate(lines):
-            self.display.blit(self.fonts["FiraCode"].render(line, True, (0, 0, 0)), (5, 5 + 16 * i))
+        # Font rendering and even the f-string formatting are skipped
+        # while the rounded values behind a line are unchanged.
+        for i, key in enumerate(keys):
+            cached = self._hud_cache.get(i)
+
+            if cached is None or cached[0] != key:
+                surf = self.fonts["FiraCode"].render(self._hud_line(i, key), True, (0, 0, 0))
+                self._hud_cache[i] = (key, surf)
+
+            else:
+                surf = cached[1]
+
+            self.display.blit(surf, (5, 5 + 16 * i))
 
         pygame.display.flip()
 
@@ -1,8 +1,11 @@
+import os
 import time
 import json
+import struct
+import select
+import signal
 from dataclasses import dataclass
 
-import keyboard
 import pygame
 
 import net
@@ -19,23 +22,51 @@ class Player:
         return json.dumps({"name": self.name, "color": self.color})
 
 
+# Wire format of a position update: b"P" tag + two little-endian int16s
+POSITION_STRUCT = struct.Struct("<hh")
+
+# Wire format of one snapshot record: player id + x + y
+SNAPSHOT_STRUCT = struct.Struct("<Hff")
+
+TICK_INTERVAL = 1.0 / 60.0
+
 clock = pygame.time.Clock()
 
+# pygame.Clock.tick sleeps with >=1 ms jitter; on Linux a timerfd gives
+# exact scheduler-backed periodic wakeups instead.
+timerfd = None
+if hasattr(os, "timerfd_create"):
+    timerfd = os.timerfd_create(time.CLOCK_MONOTONIC)
+    os.timerfd_settime(timerfd, initial=TICK_INTERVAL, interval=TICK_INTERVAL)
+
+def wait_tick():
+    """ Block until the next tick. """
+
+    if timerfd is not None:
+        # With no clients connected, doze in 1 s chunks on select instead
+        # of waking up 60 times a second for nothing.
+        if not server.clients:
+            ready, _, _ = select.select([timerfd], [], [], 1.0)
+            if not ready: return
+
+        os.read(timerfd, 8)
+
+    else:
+        clock.tick(60)
+
 server = net.TCPServer("127.0.0.1", 65432)
 
 stopped = False
-def stop():
+def stop(*args):
+    """ Let the main loop exit cleanly on Ctrl-C / termination. """
     global stopped
     stopped = True
-    try:
-        server.stop()
-    except Exception as e:
-        print("Exception occured while shutting down server:")
-        raise e
 
-keyboard.add_hotkey("esc", stop)
+signal.signal(signal.SIGINT, stop)
+signal.signal(signal.SIGTERM, stop)
 
 players: dict[net.TCPClientConnection, Player] = {}
+last_payload = b""
 
 @server.register
 def on_ready():
@@ -49,61 +80,76 @@ def on_connect(client: net.TCPClientConnection):
 @server.register
 def on_disconnect(client: net.TCPClientConnection):
     print(f"{FG.orange}Client#{RESET}{client.id} {FG.orange}disconnected.{RESET}")
+    players.pop(client, None)
 
 @server.register
 def on_packet(packet: net.common.Packet, client: net.TCPClientConnection):
-    data = packet.data.decode()
+    data = packet.data
 
     # Player name
-    if data.startswith("_"):
+    if data.startswith(b"_"):
         deserialized = json.loads(data[1:])
         players[client].name = deserialized["name"]
         players[client].color = deserialized["color"]
         print(f"Client data received: {players[client].name}")
 
-        if len(server.clients) > 1:
-            for client2 in server.clients:
+        # Same snapshot as the tick loop; the selector thread mutates
+        # clients while this runs on the dispatch worker
+        current_clients = server.clients.copy()
+
+        if len(current_clients) > 1:
+            for client2 in current_clients.values():
                 if client is client2: continue
 
                 outdata = json.dumps({"id": client.id, "name": players[client].name, "color": players[client].color})
-                client2._outgoing.put(f"_{outdata}".encode())
+                client2.send_raw(f"_{outdata}".encode())
 
                 outdata = json.dumps({"id": client2.id, "name": players[client2].name, "color": players[client2].color})
-                client._outgoing.put(f"_{outdata}".encode())
+                client.send_raw(f"_{outdata}".encode())
 
     # Coordinates
-    else:
-        posdata = data.split(",")
-        x, y = float(posdata[0]), float(posdata[1])
+    elif data.startswith(b"P"):
+        x, y = POSITION_STRUCT.unpack_from(data, 1)
         players[client].position = pygame.Vector2(x, y)
 
 server.start()
 
 start = time.time()
+last_packet_count = 0
 while not stopped:
-    clock.tick(60)
+    wait_tick()
 
-    if len(server.clients) > 1:
-        for client in server.clients:
-            s = {}
-            for client2 in players:
-                if client is client2: continue
-                player = players[client2]
+    # The network thread owns all mutation of the player table; dict.copy
+    # is one C-level op, so this snapshot can't catch it mid-mutation the
+    # way a plain iteration could.
+    current_players = players.copy()
+
+    if len(current_players) > 1:
+        # One snapshot of everyone, encoded once and shared by all clients.
+        # A client never has its own id in its player table, so it skips
+        # its own entry on receipt; that costs one dict miss there instead
+        # of a separate encode per client here.
+        snapshot = {client.id: (player.position.x, player.position.y) for client, player in current_players.items()}
 
-                s[client2.id] = (player.position.x, player.position.y)
+        if snapshot:
+            data = b"P" + b"".join(SNAPSHOT_STRUCT.pack(id_, x, y) for id_, (x, y) in snapshot.items())
 
-            if s:
-                data = json.dumps(s).encode()
-                client._outgoing.put(data)
+            # Don't re-send snapshots when nobody moved
+            if data != last_payload:
+                last_payload = data
 
-    # Remove disconnected clients
-    new_players = {}
-    for client in players:
-        if client not in server.clients: continue
-        new_players[client] = players[client]
-    players = new_players.copy()
+                # Every client shares the same payload bytes
+                server.broadcast(data)
 
     if time.time() - start >= 5.0:
         start = time.time()
-        print(f"{server._packet_counter} packets received ({round(server._packet_counter / 5.0, 2)} packets/s)")
-        server._packet_counter = 0
\ No newline at end of file
+        count = server.packet_count
+        received = count - last_packet_count
+        last_packet_count = count
+        print(f"{received} packets received ({round(received / 5.0, 2)} packets/s)")
+
+try:
+    server.stop()
+except Exception as e:
+    print("Exception occured while shutting down server:")
+    raise e
@@ -9,6 +9,20 @@ from enum import Enum
 HOSTNAME = socket.gethostname()
 LOCALHOST = socket.gethostbyname(HOSTNAME)
 
+# Bumped whenever the wire format changes; 2 is the binary struct header
+# that replaced the ASCII-decimal one
+PROTOCOL_VERSION = 2
+
+# Packet header on the wire: format byte + 4-byte length + padding byte
+HEADER_STRUCT = struct.Struct("!BIx")
+HEADER_SIZE = HEADER_STRUCT.size
+
+# Upper bound on a packet body. The length field is attacker-controlled
+# and the receive buffers grow to fit it, so a corrupt or hostile header
+# must not dictate the allocation; anything claiming more than this gets
+# the connection dropped. Far above anything the games send.
+MAX_PACKET_SIZE = 16 * 1024 * 1024
+
 
 def build_header(fmt: int, length: int) -> bytes:
     """
@@ -17,17 +31,17 @@ def build_header(fmt: int, length: int) -> bytes:
     Parameters
     ----------
     fmt
-        Format of the packet, in range [0-9].
+        Format of the packet, in range [0-255].
     length
         Length of the rest of the packet.
 
     Returns
     -------
     bytes
-        Header data consisting of 5 bytes.
+        Header data consisting of 6 bytes.
     """
 
-    return struct.pack("H", fmt)[:1] + str(length).zfill(5).encode()
+    return HEADER_STRUCT.pack(fmt, length)
 
 def build_packet(fmt: int, data: bytes) -> bytes:
     """
@@ -36,7 +50,7 @@ def build_packet(fmt: int, data: bytes) -> bytes:
     Parameters
     ----------
     fmt
-        Format of the packet, in range [0-9].
+        Format of the packet, in range [0-255].
     data
         Raw binary data.
 
@@ -49,6 +63,27 @@ def build_packet(fmt: int, data: bytes) -> bytes:
     return build_header(fmt, len(data)) + data
 
 
+if hasattr(socket.socket, "sendmsg"):
+    def sendmsg_all(sock: socket.socket, buffers: list[bytes]) -> None:
+        """
+        Send all buffers with a single scatter-gather syscall.
+
+        The kernel consumes the buffers without a userspace concatenation;
+        a short write falls back to sendall on the remainder.
+        """
+
+        sent = sock.sendmsg(buffers)
+
+        if sent < sum(map(len, buffers)):
+            sock.sendall(b"".join(buffers)[sent:])
+
+else:
+    def sendmsg_all(sock: socket.socket, buffers: list[bytes]) -> None:
+        """ Fallback for platforms without sendmsg (Windows). """
+
+        sock.sendall(b"".join(buffers))
+
+
 class PacketFormat(Enum):
     """
     Reserved packet formats.
@@ -59,17 +94,26 @@ class PacketFormat(Enum):
     HEARTBEAT_PONG = 2
 
 
-@dataclass
+# Heartbeat packets are fixed 6-byte constants, built once
+HEARTBEAT_PING_PACKET = build_packet(PacketFormat.HEARTBEAT_PING.value, b"")
+HEARTBEAT_PONG_PACKET = build_packet(PacketFormat.HEARTBEAT_PONG.value, b"")
+
+
+# These two are allocated per received packet; slots skip the per-instance
+# __dict__, which keeps them small and makes attribute access faster
+@dataclass(slots=True)
 class Header:
     """
     Packet header.
     """
 
-    format: PacketFormat
+    # A PacketFormat value kept as a plain int; constructing the enum per
+    # received packet costs more than the whole header parse
+    format: int
     length: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Packet:
     """
     Raw binary packet.
@@ -98,22 +142,24 @@ class EventManager:
     """
 
     def __init__(self) -> None:
-        self.__event_callbacks = {}
+        self.__event_callbacks: dict[str, tuple[Callable, ...]] = {}
 
     def register(self, event_callback: Callable) -> None:
         """ Register a callback as an event. """
 
         event_name = event_callback.__name__
 
-        if event_name not in self.__event_callbacks:
-            self.__event_callbacks[event_name] = []
+        # Stored as tuples so hot loops can grab and iterate them directly
+        self.__event_callbacks[event_name] = \
+            self.__event_callbacks.get(event_name, ()) + (event_callback,)
 
-        self.__event_callbacks[event_name].append(event_callback)
+    def callbacks(self, event_name: str) -> tuple[Callable, ...]:
+        """ Callbacks registered for an event, for prefetching in hot loops. """
+
+        return self.__event_callbacks.get(event_name, ())
 
     def trigger(self, event_name: str, *args, **kwargs) -> None:
         """ Trigger an event. """
 
-        if event_name not in self.__event_callbacks: return
-
-        for event_callback in self.__event_callbacks[event_name]:
+        for event_callback in self.__event_callbacks.get(event_name, ()):
             event_callback(*args, **kwargs)
\ No newline at end of file
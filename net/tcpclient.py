@@ -1,9 +1,17 @@
 import socket
 import threading
 from time import time, perf_counter
-from queue import Queue, Empty
+from collections import deque
 
-from .common import EventManager, Packet, Header, PacketFormat, build_packet, ConnectionProfile
+from .common import EventManager, Packet, Header, PacketFormat, ConnectionProfile, HEADER_STRUCT, HEADER_SIZE, MAX_PACKET_SIZE, sendmsg_all, HEARTBEAT_PING_PACKET
+
+
+# Cached plain ints, hot loops shouldn't touch the Enum machinery
+_RAW = PacketFormat.RAW.value
+_HEARTBEAT_PONG = PacketFormat.HEARTBEAT_PONG.value
+
+# Prebound pack skips the build_header call frame per packet
+_pack_header = HEADER_STRUCT.pack
 
 
 class TCPClient:
@@ -40,20 +48,39 @@ class TCPClient:
         self._port = port
 
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Don't let Nagle's algorithm delay the small game packets
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Roomier kernel buffers than the distro default, so bursts and
+        # large packets don't stall on buffer space
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
         self.latency = 0.0
         self._heartbeat_last = 0.0
         self._heartbeat_sent = 0.0
         self._is_heartbeat_done = True
+        self._last_tx = 0.0
 
         self._event_manager = EventManager()
         self.register = self._event_manager.register
 
-        self._outgoing = Queue()
-        self._incoming = Queue()
-        self._queue_timeout = 0.1
+        # Single-producer/single-consumer queues; deque append/popleft are
+        # atomic under the GIL, so only the wakeup needs an Event instead
+        # of queue.Queue's lock + condition per operation
+        # None is the shutdown sentinel, pushed by disconnect()
+        self._outgoing: deque[bytes | None] = deque()
+        self._outgoing_evt = threading.Event()
+        self._incoming: deque[Packet | None] = deque()
+        self._incoming_evt = threading.Event()
+
+        # Receive buffer; complete packets are carved out of it in place
+        self._rx_buf = bytearray(65536)
 
         self._is_running = False
 
+        # Set True to populate connection_profile; off by default so the
+        # hot loops don't pay two clock reads per packet
+        self._profile = False
+
         self._listener_thread: threading.Thread
         self._processer_thread: threading.Thread
         self._sender_thread: threading.Thread
@@ -81,6 +108,12 @@ class TCPClient:
         self._sender_thread = threading.Thread(target=self._send_job, daemon=False)
         self._sender_thread.start()
 
+    def send_raw(self, data: bytes) -> None:
+        """ Queue raw data to be sent to the server. """
+
+        self._outgoing.append(data)
+        self._outgoing_evt.set()
+
     def disconnect(self) -> None:
         """ Stop the connection. """
 
@@ -89,112 +122,213 @@ class TCPClient:
         self._is_running = False
 
         self._event_manager.trigger("on_disconnect")
+
+        # shutdown wakes a listener thread blocked in recv, close alone
+        # leaves it stuck until the server closes its end
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
         self._socket.close()
 
+        # Unblock the worker threads so they exit right away
+        self._incoming.append(None)
+        self._incoming_evt.set()
+        self._outgoing.append(None)
+        self._outgoing_evt.set()
+
     def _listen_job(self) -> None:
         """
         Listener thread.
-        
-        Receive header (6 bytes) -> Receive rest of the packet -> Put into queue
+
+        One large recv pulls the header, the payload and often several
+        following packets together; complete packets are then carved out
+        of the buffer without extra syscalls.
         """
 
+        buf = self._rx_buf
+        view = memoryview(buf)
+        head = 0
+        tail = 0
+
+        unpack_header = HEADER_STRUCT.unpack_from
+        incoming = self._incoming
+        incoming_evt = self._incoming_evt
+
         while self._is_running:
-            frame_start = perf_counter()
+            # Snapshot so a mid-iteration toggle can't skip frame_start
+            profiling = self._profile
+            if profiling: frame_start = perf_counter()
+
+            # Compact once the unread remainder leaves little room to grow
+            if head and len(buf) - tail < 4096:
+                buf[:tail - head] = buf[head:tail]
+                tail -= head
+                head = 0
 
             try:
-                # Receive header
-                in_packet_data = self._socket.recv(6)
-            
+                received = self._socket.recv_into(view[tail:])
+
             except (ConnectionResetError, ConnectionAbortedError):
                 self.disconnect()
                 break
 
-            except OSError as e:
+            except OSError:
                 self.disconnect()
                 break
-                
-            if not in_packet_data:
+
+            if received == 0:
                 self.disconnect()
                 break
 
-            header = Header(PacketFormat(int(in_packet_data[0])), int(in_packet_data[1:]))
+            tail += received
+            recv_time = perf_counter()
 
-            # Receive rest of the packet
-            try:
-                in_packet_data = self._socket.recv(header.length)
-                recv_time = perf_counter()
+            while tail - head >= HEADER_SIZE:
+                fmt, length = unpack_header(buf, head)
 
-            except (ConnectionResetError, ConnectionAbortedError):
-                self.disconnect()
-                break
-
-            except OSError as e:
-                if not self._is_running:
+                if length > MAX_PACKET_SIZE:
+                    # Corrupt or hostile length field; drop the
+                    # connection instead of allocating what it claims
                     self.disconnect()
+                    return
+
+                if HEADER_SIZE + length > len(buf):
+                    # Packet bigger than the whole buffer, grow to fit
+                    new_buf = bytearray(max(len(buf) * 2, HEADER_SIZE + length))
+                    new_buf[:tail - head] = buf[head:tail]
+                    tail -= head
+                    head = 0
+                    buf = self._rx_buf = new_buf
+                    view = memoryview(buf)
                     break
 
-                else: raise e
+                if tail - head - HEADER_SIZE < length: break
 
-            # Connection closed while receiving, do not issue any more packets
-            if not self._is_running:
-                break
+                # The one per-packet copy. Handing a memoryview into the
+                # buffer across threads would be freed-under-the-reader
+                # territory once this side compacts, so the body is
+                # detached here; empty bodies (heartbeats) skip even that.
+                if length:
+                    body = bytes(buf[head + HEADER_SIZE:head + HEADER_SIZE + length])
+                else:
+                    body = b""
+                head += HEADER_SIZE + length
 
-            in_packet = Packet(in_packet_data, header, recv_time)
-            self._incoming.put(in_packet)
+                incoming.append(Packet(body, Header(fmt, length), recv_time))
+                incoming_evt.set()
 
-            self._listener_time = perf_counter() - frame_start
+            if profiling: self._listener_time = perf_counter() - frame_start
 
     def _process_job(self) -> None:
         """ Packet processer thread. """
 
+        # Prefetched once; all callbacks are registered before connect()
+        on_packet_callbacks = self._event_manager.callbacks("on_packet")
+
         while self._is_running:
-            frame_start = perf_counter()
+            profiling = self._profile
+            if profiling: frame_start = perf_counter()
+
+            # Block until a packet (or the shutdown sentinel) arrives,
+            # no periodic wakeups just to re-check is_running
+            self._incoming_evt.wait()
 
             try:
-                packet = self._incoming.get(timeout=self._queue_timeout)
-            except Empty:
-                continue
+                packet = self._incoming.popleft()
+            except IndexError:
+                self._incoming_evt.clear()
+
+                # An append can land between the failed popleft and the
+                # clear, and the clear wipes its wakeup; recheck so that
+                # packet isn't stranded until the next one arrives
+                if not self._incoming:
+                    continue
+                packet = self._incoming.popleft()
 
-            if packet.header.format == PacketFormat.HEARTBEAT_PONG:
+            if packet is None: return
+
+            if packet.header.format == _HEARTBEAT_PONG:
                 self._is_heartbeat_done = True
                 self.latency = packet.timestamp - self._heartbeat_sent
 
             else:
-                self._event_manager.trigger("on_packet", packet)
-
-            self._incoming.task_done()
+                for event_callback in on_packet_callbacks:
+                    event_callback(packet)
 
-            self._processer_time = perf_counter() - frame_start
+            if profiling: self._processer_time = perf_counter() - frame_start
 
     def _send_job(self) -> None:
         """ Packet sender thread. """
 
         while self._is_running:
-            frame_start = perf_counter()
+            profiling = self._profile
+            if profiling: frame_start = perf_counter()
 
-            # Send heartbeat ping
-            if self._is_heartbeat_done and time() - self._heartbeat_last >= 0.5:
-                self._heartbeat_last = time()
-                self._is_heartbeat_done = False
-                self._heartbeat_sent = perf_counter()
+            # Send heartbeat ping. Recent application traffic already
+            # proves the link is alive and defers the ping, capped at 2 s
+            # so the latency estimate still refreshes under steady load.
+            if self._is_heartbeat_done:
+                now = time()
+                since_last = now - self._heartbeat_last
 
-                try:
-                    hb_packet = build_packet(PacketFormat.HEARTBEAT_PING.value, b"")
-                    self._socket.sendall(hb_packet)
+                if since_last >= 2.0 or (since_last >= 0.5 and perf_counter() - self._last_tx >= 0.5):
+                    self._heartbeat_last = now
+                    self._is_heartbeat_done = False
+                    self._heartbeat_sent = perf_counter()
 
-                except (ConnectionResetError, ConnectionAbortedError):
-                    self.disconnect()
-                    break
+                    try:
+                        self._socket.sendall(HEARTBEAT_PING_PACKET)
+
+                    except (ConnectionResetError, ConnectionAbortedError):
+                        self.disconnect()
+                        break
+
+            # Sleep until there is data to send or the next heartbeat is
+            # due; an idle connection wakes up twice a second at most
+            timeout = self._heartbeat_last + 0.5 - time()
+            if timeout <= 0.0:
+                # Heartbeat due but the pong is still in flight
+                timeout = 0.05
+
+            self._outgoing_evt.wait(timeout)
 
             try:
-                data = self._outgoing.get(timeout=self._queue_timeout)
-            except Empty:
-                continue
+                data = self._outgoing.popleft()
+            except IndexError:
+                self._outgoing_evt.clear()
+
+                # Same lost-wakeup race as the incoming queue: a send
+                # queued between popleft and clear would sit until the
+                # heartbeat timeout otherwise
+                if not self._outgoing:
+                    continue
+                data = self._outgoing.popleft()
+
+            if data is None: return
+
+            # Drain whatever else queued up and gather it all into a
+            # single sendmsg; capped at 64 messages to bound latency
+            iov = [_pack_header(_RAW, len(data)), data]
+
+            while len(iov) < 128:
+                try:
+                    data = self._outgoing.popleft()
+                except IndexError:
+                    break
+
+                if data is None:
+                    # Shutdown sentinel, handle it on the next pass
+                    self._outgoing.appendleft(None)
+                    break
 
-            packet = build_packet(PacketFormat.RAW.value, data)
+                iov.append(_pack_header(_RAW, len(data)))
+                iov.append(data)
 
             try:
-                self._socket.sendall(packet)
+                # Headers and payloads go out in one gather-write, no copies
+                sendmsg_all(self._socket, iov)
+                self._last_tx = perf_counter()
 
             except (ConnectionResetError, ConnectionAbortedError):
                 self.disconnect()
@@ -207,7 +341,7 @@ class TCPClient:
 
                 else: raise e
 
-            self._sender_time = perf_counter() - frame_start
+            if profiling: self._sender_time = perf_counter() - frame_start
 
     @property
     def connection_profile(self) -> ConnectionProfile:
@@ -1,10 +1,24 @@
 import socket
+import selectors
+import itertools
 import threading
+import traceback
 from datetime import datetime
-from time import time, perf_counter
-from queue import Queue, Empty
+from time import time, sleep, perf_counter
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-from .common import EventManager, Packet, Header, PacketFormat, ConnectionProfile, build_packet
+from .common import EventManager, Packet, Header, PacketFormat, ConnectionProfile, HEADER_STRUCT, HEADER_SIZE, MAX_PACKET_SIZE, HEARTBEAT_PONG_PACKET
+
+
+# Cached plain ints, hot loops shouldn't touch the Enum machinery
+_RAW = PacketFormat.RAW.value
+_HEARTBEAT_PING = PacketFormat.HEARTBEAT_PING.value
+
+# Prebound pack skips the build_header call frame per packet
+_pack_header = HEADER_STRUCT.pack
+
+_HAS_SENDMSG = hasattr(socket.socket, "sendmsg")
 
 
 class TCPServer:
@@ -13,7 +27,9 @@ class TCPServer:
 
     This class provides functionality to start a TCP server, listen to incoming
     connections and manage communication between clients.
-    The listening is non-blocking.
+    All sockets are served by one selector-based event loop thread (epoll on
+    Linux, kqueue on BSD/macOS) instead of three threads per connection, so
+    idle connections cost no wakeups and N clients don't fight over the GIL.
 
     Parameters
     ----------
@@ -26,6 +42,20 @@ class TCPServer:
     max_connections
         Maximum number of connections the server allows at a time.
         0 means no limit defined.
+    busy_wait
+        Poll the selector in a tight loop instead of blocking in it.
+        Shaves the epoll_wait wakeup latency off every packet at the
+        cost of pinning one core; only worth it for latency-critical
+        runs on a machine with cores to spare.
+    nodelay
+        Disable Nagle's algorithm on accepted sockets so small packets
+        go out immediately instead of being coalesced into bursts.
+    rcvbuf
+        SO_RCVBUF size requested for accepted sockets.
+        0 keeps the system default.
+    profile
+        Populate connection_profile timings. Off by default so the
+        event loop doesn't pay two clock reads per handler call.
 
     Events
     ------
@@ -37,13 +67,20 @@ class TCPServer:
         Triggered when a client is disconnected.
     on_packet(packet, client)
         Triggered when a packet is received.
+        Packet objects are recycled once the callbacks return; keep
+        packet.data (a plain bytes) if anything must outlive the
+        callback, not the Packet itself.
     """
 
     def __init__(self,
             host: str,
             port: int,
             backlog: int = 5,
-            max_connections: int = 0
+            max_connections: int = 0,
+            busy_wait: bool = False,
+            nodelay: bool = True,
+            rcvbuf: int = 262144,
+            profile: bool = False
             ) -> None:
         super().__init__()
 
@@ -51,19 +88,49 @@ class TCPServer:
         self._port = port
         self._backlog = backlog
         self._max_connections = max_connections
-        self._conn_sem = threading.Semaphore(self._max_connections)
-        
+        self._busy_wait = busy_wait
+        self._nodelay = nodelay
+        self._rcvbuf = rcvbuf
+        self._profile = profile
+
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._socket.bind((self._host, self._port))
 
-        self.clients: list[TCPClientConnection] = list()
-        self._packet_counter = 0
+        # Keyed by connection id so disconnects are O(1) removals
+        self.clients: dict[int, TCPClientConnection] = {}
+        self._next_id = 0
+
+        # Counts from connections that already closed; live connections
+        # carry their own counter, summed on demand in packet_count
+        self._packet_count_base = 0
 
         self._event_manager = EventManager()
         self.register = self._event_manager.register
 
+        # User callbacks run on one dedicated worker so a slow handler
+        # can't stall socket I/O; a single worker keeps event order
+        self._dispatch = ThreadPoolExecutor(max_workers=1)
+
+        self._selector = selectors.DefaultSelector()
+        self._accepting = False
+
+        # Socket pair used as a self-pipe to wake the loop from other
+        # threads (send_raw callers, disconnects, stop)
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+
+        # Intents posted by other threads, drained on the loop thread.
+        # Writes travel as (client, header, data) so the loop thread is
+        # the only writer of the per-connection tx queues; two separate
+        # appends from concurrent callers could interleave a buffer
+        # between another message's header and body.
+        self._write_pending: deque[tuple[TCPClientConnection, bytes, bytes]] = deque()
+        self._drop_pending: deque[TCPClientConnection] = deque()
+
         self._is_running = False
 
+        self._loop_thread: threading.Thread
+
     def __repr__(self) -> str:
         return f"<{__name__}.{self.__class__.__name__}({self._host}:{self._port}, {len(self.clients)} connections)>"
 
@@ -72,62 +139,210 @@ class TCPServer:
 
         self._is_running = True
 
-        self.listener_thread = threading.Thread(target=self._listen_job, daemon=False)
-        self.listener_thread.start()
+        self._socket.listen(self._backlog)
+        self._socket.setblocking(False)
+
+        self._accepting = True
+        self._selector.register(self._socket, selectors.EVENT_READ, None)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+        self._loop_thread = threading.Thread(target=self._loop_job, daemon=False)
+        self._loop_thread.start()
 
     def stop(self) -> None:
         """ Stop the server and release the resources. """
 
         self._is_running = False
+        self._wake()
+        self._loop_thread.join()
+
+        for client in tuple(self.clients.values()):
+            self._drop(client)
+
+        self._selector.close()
         self._socket.close()
-        self._conn_sem.release()
+        self._wake_r.close()
+        self._wake_w.close()
 
-        self.listener_thread.join()
+        # Flush the remaining disconnect callbacks
+        self._dispatch.shutdown(wait=True)
 
-        for client in self.clients:
-            client.disconnect()
-        
-        for client in self.clients:
-            client._listener_thread.join()
-            client._processer_thread.join()
-            client._sender_thread.join()
+    def _submit(self, fn, *args) -> None:
+        """ Run a user callback on the dispatch worker. """
 
-    def _listen_job(self) -> None:
-        """ Connection listener thread. """
+        self._dispatch.submit(self._run_dispatched, fn, *args)
 
-        self._socket.listen(self._backlog)
-        self._event_manager.trigger("on_ready")
+    @staticmethod
+    def _run_dispatched(fn, *args) -> None:
+        # submit() parks exceptions in the Future, and nothing keeps the
+        # Future around; report them like a plain thread would instead of
+        # letting them vanish
+        try:
+            fn(*args)
+        except Exception:
+            traceback.print_exc()
+
+    def _wake(self) -> None:
+        """ Wake the event loop up from another thread. """
+
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _loop_job(self) -> None:
+        """ Selector event loop thread. """
+
+        self._submit(self._event_manager.trigger, "on_ready")
+
+        select_timeout = 0.0 if self._busy_wait else 0.5
 
         while self._is_running:
-            # Block if max connections is reached
-            if self._max_connections > 0:
-                self._conn_sem.acquire()
+            if self._busy_wait:
+                # Yield the GIL so other threads still get a turn
+                sleep(0)
+
+            for key, mask in self._selector.select(select_timeout):
+                client: TCPClientConnection = key.data
+
+                if client is None:
+                    if key.fileobj is self._wake_r:
+                        # Drain wake tokens, the work is in the intent queues
+                        try:
+                            self._wake_r.recv(4096)
+                        except OSError:
+                            pass
+
+                    else:
+                        self._accept()
+
+                else:
+                    # Contained per client: an unexpected error (e.g. a
+                    # MemoryError from a hostile frame) costs that one
+                    # connection, not the server's only I/O thread
+                    try:
+                        if mask & selectors.EVENT_READ:
+                            client._on_readable()
+
+                        if mask & selectors.EVENT_WRITE and not client._dropped:
+                            client._on_writable()
 
+                    except Exception:
+                        traceback.print_exc()
+                        self._drop(client)
+
+            # Apply intents posted from other threads
+            while self._drop_pending:
+                self._drop(self._drop_pending.popleft())
+
+            while self._write_pending:
+                client, header, data = self._write_pending.popleft()
+
+                if not client._dropped:
+                    client._tx.append(header)
+                    client._tx.append(data)
+                    client._set_write_interest(True)
+
+    def _accept(self) -> None:
+        """ Accept a new client connection on the loop thread. """
+
+        try:
+            connection, address_pair = self._socket.accept()
+
+        except OSError:
+            return
+
+        connection.setblocking(False)
+
+        if self._nodelay:
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        if self._rcvbuf:
+            connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self._rcvbuf)
+
+        # Don't wake the loop until at least a whole header arrived
+        if hasattr(socket, "SO_RCVLOWAT"):
             try:
-                connection, address_pair = self._socket.accept()
-
-            except OSError as e:
-                # Server might've been stopped while listening
-                if not self._is_running: break
-                else: raise e
-
-            client = TCPClientConnection(
-                self,
-                connection,
-                address_pair[0],
-                address_pair[1],
-                len(self.clients)
-            )
+                connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVLOWAT, HEADER_SIZE)
+            except OSError:
+                pass
+
+        client = TCPClientConnection(
+            self,
+            connection,
+            address_pair[0],
+            address_pair[1],
+            self._next_id
+        )
+        self._next_id += 1
+
+        self.clients[client.id] = client
+        self._selector.register(connection, selectors.EVENT_READ, client)
+        self._submit(self._event_manager.trigger, "on_connect", client)
+
+        # Stop accepting while full instead of blocking a listener thread
+        if self._max_connections > 0 and len(self.clients) >= self._max_connections:
+            self._accepting = False
+            self._selector.unregister(self._socket)
+
+    def _drop(self, client: "TCPClientConnection") -> None:
+        """ Tear down a client connection on the loop thread. """
+
+        if client._dropped: return
+        client._dropped = True
+
+        try:
+            self._selector.unregister(client._socket)
+        except (KeyError, ValueError):
+            pass
+
+        client._socket.close()
+
+        self.clients.pop(client.id, None)
+        self._packet_count_base += client._packet_count
+
+        self._submit(self._event_manager.trigger, "on_disconnect", client)
+
+        # Room for new connections again
+        if (not self._accepting and self._is_running
+                and (self._max_connections == 0 or len(self.clients) < self._max_connections)):
+            self._accepting = True
+            self._selector.register(self._socket, selectors.EVENT_READ, None)
+
+    def broadcast(self, data: bytes) -> None:
+        """
+        Queue raw data to be sent to every connected client.
+
+        The header is built once and all connections share the same two
+        buffers; no per-client copies are made. Thread-safe: messages go
+        through the intent queue and only the loop thread touches the
+        per-connection tx queues, so a concurrent send_raw can't split
+        a header from its body.
+        """
+
+        header = _pack_header(_RAW, len(data))
+        write_pending = self._write_pending
+
+        # copy() snapshots the table against the loop thread mutating it
+        for client in self.clients.copy().values():
+            write_pending.append((client, header, data))
+
+        self._wake()
+
+    @property
+    def packet_count(self) -> int:
+        """ Total number of packets received since the server started. """
+
+        # copy() snapshots the table against the loop thread mutating it
+        return self._packet_count_base + sum(
+            client._packet_count for client in self.clients.copy().values()
+        )
 
-            self.clients.append(client)
-            self._event_manager.trigger("on_connect", client)
-            client._start()
-    
     @property
     def host(self) -> str:
         """ Hostname or IPv4 address. """
         return self._host
-    
+
     @property
     def port(self) -> int:
         """ The port number. """
@@ -139,15 +354,18 @@ class TCPClientConnection:
     Client connection to the TCP server.
 
     This class shouldn't be created manually, the server manages connections.
+    All socket I/O happens on the server's event loop thread; send_raw and
+    disconnect are safe to call from any thread.
 
     Attributes
     ----------
     id
         Unique identifier of this connection.
-        Two clients' IDs can be same at different times if both are not
-        existant in the server at the same time.
+        IDs are handed out monotonically, so they are never reused for
+        the lifetime of the server.
     connected_at
-        Timestamp of the start of the connection
+        Unix timestamp of the start of the connection; connected_at_dt
+        gives it as a datetime.
     """
 
     def __init__(self,
@@ -158,22 +376,34 @@ class TCPClientConnection:
             id_: int
             ) -> None:
         self.id = id_
-        self.connected_at = datetime.fromtimestamp(time())
+        # Kept as a float; building a datetime on the accept path is
+        # wasted work when the field is rarely read
+        self.connected_at = time()
 
         self._server = server
         self._socket = socket_
         self._host = host
         self._port = port
 
-        self._outgoing = Queue()
-        self._incoming = Queue()
-        self._queue_timeout = 0.1
+        # Reusable receive buffer; unparsed bytes live in [head, tail)
+        # and complete packets are carved out of it in place
+        self._rx_buf = bytearray(65536)
+        self._rx_view = memoryview(self._rx_buf)
+        self._rx_head = 0
+        self._rx_tail = 0
 
-        self._is_running = False
+        # Bounded free list recycling Packet/Header wrappers, so a steady
+        # packet stream stops allocating them at all
+        self._packet_pool: deque[Packet] = deque(maxlen=64)
+
+        # Pending outgoing buffers and the partial-send offset into the head
+        self._tx: deque[bytes] = deque()
+        self._tx_offset = 0
+        self._write_interest = False
+
+        self._dropped = False
+        self._packet_count = 0
 
-        self._listener_thread: threading.Thread
-        self._processer_thread: threading.Thread
-        self._sender_thread: threading.Thread
         self._listener_time = 0.0
         self._processer_time = 0.0
         self._sender_time = 0.0
@@ -181,136 +411,206 @@ class TCPClientConnection:
     def __repr__(self) -> str:
         return f"<{__name__}.{self.__class__.__name__}({self.id}, {self._host}:{self._port})>"
 
-    def _start(self) -> None:
-        self._is_running = True
-
-        self._listener_thread = threading.Thread(target=self._listen_job, daemon=False)
-        self._listener_thread.start()
+    def send_raw(self, data: bytes) -> None:
+        """ Queue raw data to be sent to this client. """
 
-        self._processer_thread = threading.Thread(target=self._process_job, daemon=False)
-        self._processer_thread.start()
-
-        self._sender_thread = threading.Thread(target=self._send_job, daemon=False)
-        self._sender_thread.start()
+        # Header and payload stay separate buffers, no concatenation;
+        # they go to the tx queue together on the loop thread so another
+        # sender can't slip a buffer in between them
+        self._server._write_pending.append((self, _pack_header(_RAW, len(data)), data))
+        self._server._wake()
 
     def disconnect(self) -> None:
         """ Disconnect client from server. """
 
-        # Two threads might call this at the same time
-        if (not self._is_running): return
-        self._is_running = False
-  
-        self._server.clients.remove(self)
-        self._server._event_manager.trigger("on_disconnect", self)
-        self._socket.close()
-        self._server._conn_sem.release()
+        self._server._drop_pending.append(self)
+        self._server._wake()
 
-    def _listen_job(self) -> None:
-        """
-        Listener thread.
-        
-        Receive header (6 bytes) -> Receive rest of the packet -> Put into queue.
-        """
+    def _on_readable(self) -> None:
+        """ Read available bytes and dispatch every complete packet. """
 
-        while self._is_running:
-            frame_start = perf_counter()
+        profiling = self._server._profile
+        if profiling: frame_start = perf_counter()
 
-            try:
-                # Receive header
-                in_packet_data = self._socket.recv(6)
-            
-            except (ConnectionResetError, ConnectionAbortedError):
-                self.disconnect()
-                return
-
-            except OSError as e:
-                if not self._is_running:
-                    self.disconnect()
-                    return
+        buf = self._rx_buf
+        head = self._rx_head
+        tail = self._rx_tail
 
-                else: raise e
+        # Compact once the unread remainder leaves little room to grow
+        if head and len(buf) - tail < 4096:
+            buf[:tail - head] = buf[head:tail]
+            tail -= head
+            head = 0
 
-            if not in_packet_data:
-                self.disconnect()
-                return
+        try:
+            received = self._socket.recv_into(self._rx_view[tail:])
 
-            header = Header(PacketFormat(int(in_packet_data[0])), int(in_packet_data[1:]))
+        except BlockingIOError:
+            return
 
-            # Receive rest of the package
-            try:
-                in_packet_data = self._socket.recv(header.length)
-                recv_time = perf_counter()
+        except OSError:
+            self._server._drop(self)
+            return
 
-            except (ConnectionResetError, ConnectionAbortedError):
-                self.disconnect()
-                return
+        # Peer closed the connection
+        if received == 0:
+            self._server._drop(self)
+            return
 
-            except OSError as e:
-                if not self._is_running:
-                    self.disconnect()
-                    return
+        tail += received
+        recv_time = perf_counter()
 
-                else: raise e
+        # One lookup shared by every packet carved out of this recv
+        on_packet_callbacks = self._server._event_manager.callbacks("on_packet")
 
-            # Connection closed while receiving, do not issue any more packets
-            if not self._is_running:
-                return
+        dispatched = []
 
-            in_packet = Packet(in_packet_data, header, recv_time)
-            self._incoming.put(in_packet)
-            self._server._packet_counter += 1
+        dropping = False
 
-            self.listener_time = perf_counter() - frame_start
+        while tail - head >= HEADER_SIZE:
+            fmt, length = HEADER_STRUCT.unpack_from(buf, head)
 
-    def _process_job(self) -> None:
-        """ Packet processer thread. """
+            if length > MAX_PACKET_SIZE:
+                # Corrupt or hostile length field; drop the connection
+                # instead of allocating whatever it claims
+                dropping = True
+                break
 
-        while self._is_running:
-            frame_start = perf_counter()
-            
-            try:
-                packet = self._incoming.get(timeout=self._queue_timeout)
-            except Empty:
-                continue
+            if HEADER_SIZE + length > len(buf):
+                # Packet bigger than the whole buffer, grow to fit
+                new_buf = bytearray(max(len(buf) * 2, HEADER_SIZE + length))
+                new_buf[:tail - head] = buf[head:tail]
+                tail -= head
+                head = 0
+                buf = self._rx_buf = new_buf
+                self._rx_view = memoryview(new_buf)
+                break
 
-            if packet.header.format == PacketFormat.HEARTBEAT_PING:
-                out_packet = build_packet(PacketFormat.HEARTBEAT_PONG.value, b"")
+            if tail - head - HEADER_SIZE < length: break
 
-                try:
-                    self._socket.sendall(out_packet)
+            # The only per-packet copy, made when the body is handed on
+            if length:
+                body = bytes(buf[head + HEADER_SIZE:head + HEADER_SIZE + length])
+            else:
+                body = b""
+            head += HEADER_SIZE + length
+            self._packet_count += 1
 
-                except (ConnectionResetError, ConnectionAbortedError):
-                    self.disconnect()
-                    break
+            if fmt == _HEARTBEAT_PING:
+                # Answer heartbeats right here, no queue hop
+                self._tx.append(HEARTBEAT_PONG_PACKET)
+                self._set_write_interest(True)
 
             else:
-                self._server._event_manager.trigger("on_packet", packet, self)
+                try:
+                    packet = self._packet_pool.popleft()
+                    packet.data = body
+                    packet.header.format = fmt
+                    packet.header.length = length
+                    packet.timestamp = recv_time
+                except IndexError:
+                    packet = Packet(body, Header(fmt, length), recv_time)
+
+                dispatched.append(packet)
+
+        self._rx_head = head
+        self._rx_tail = tail
+
+        if dispatched:
+            # One submit per recv batch keeps the executor overhead off
+            # the per-packet path
+            self._server._submit(
+                self._run_packet_callbacks, on_packet_callbacks, dispatched
+            )
 
-            self._incoming.task_done()
+        # After the dispatch so packets parsed cleanly before the bad
+        # header still get delivered ahead of on_disconnect
+        if dropping:
+            self._server._drop(self)
 
-            self.processer_time = perf_counter() - frame_start
+        if profiling: self._listener_time = perf_counter() - frame_start
 
-    def _send_job(self) -> None:
-        """ Packet sender thread. """
+    def _run_packet_callbacks(self, callbacks, packets: list[Packet]) -> None:
+        """ Deliver a batch of packets to the user callbacks. Runs on the
+        server's dispatch worker. """
 
-        while self._is_running:
-            frame_start = perf_counter()
+        for packet in packets:
+            for event_callback in callbacks:
+                # Contained per call so one bad packet doesn't drop the
+                # rest of the batch; a no-exception try is free on 3.11
+                try:
+                    event_callback(packet, self)
+                except Exception:
+                    traceback.print_exc()
 
-            try:
-                data = self._outgoing.get(timeout=self._queue_timeout)
-            except Empty:
-                continue
+        # Recycle the wrappers; the deque's maxlen caps the pool
+        self._packet_pool.extend(packets)
 
-            packet = build_packet(PacketFormat.RAW.value, data)
+    def _on_writable(self) -> None:
+        """ Flush as much pending outgoing data as the socket accepts. """
 
-            try:
-                self._socket.sendall(packet)
+        profiling = self._server._profile
+        if profiling: frame_start = perf_counter()
 
-            except (ConnectionResetError, ConnectionAbortedError):
-                self.disconnect()
-                break
+        tx = self._tx
+
+        try:
+            while tx:
+                if _HAS_SENDMSG:
+                    # Up to 64 pending buffers go out in one gather write
+                    iov = list(itertools.islice(tx, 64))
+                    if self._tx_offset:
+                        iov[0] = memoryview(iov[0])[self._tx_offset:]
+
+                    sent = self._tx_offset + self._socket.sendmsg(iov)
+
+                else:
+                    head = tx[0]
+                    if self._tx_offset:
+                        head = memoryview(head)[self._tx_offset:]
+
+                    sent = self._tx_offset + self._socket.send(head)
+
+                # Drop fully written buffers, keep the offset into the next
+                self._tx_offset = 0
+                while tx and sent >= len(tx[0]):
+                    sent -= len(tx[0])
+                    tx.popleft()
+
+                if sent:
+                    # Kernel buffer filled mid-buffer, keep write interest
+                    self._tx_offset = sent
+                    return
+
+        except BlockingIOError:
+            return
+
+        except OSError:
+            self._server._drop(self)
+            return
+
+        self._set_write_interest(False)
+
+        if profiling: self._sender_time = perf_counter() - frame_start
+
+    def _set_write_interest(self, interested: bool) -> None:
+        """ Toggle EVENT_WRITE registration. Loop thread only. """
+
+        if interested == self._write_interest: return
+        self._write_interest = interested
 
-            self.sender_time = perf_counter() - frame_start
+        events = selectors.EVENT_READ
+        if interested: events |= selectors.EVENT_WRITE
+
+        try:
+            self._server._selector.modify(self._socket, events, self)
+        except (KeyError, ValueError, OSError):
+            pass
+
+    @property
+    def connected_at_dt(self) -> datetime:
+        """ Start of the connection as a datetime. """
+        return datetime.fromtimestamp(self.connected_at)
 
     @property
     def connection_profile(self) -> ConnectionProfile:
@@ -320,13 +620,13 @@ class TCPClientConnection:
             self._processer_time,
             self._sender_time
         )
-    
+
     @property
     def host(self) -> str:
         """ Hostname or IPv4 address. """
         return self._host
-    
+
     @property
     def port(self) -> int:
         """ The port number. """
-        return self._port
\ No newline at end of file
+        return self._port
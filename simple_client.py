@@ -17,7 +17,7 @@ def on_packet(packet: net.common.Packet):
     print(f"Packet: {packet.data.decode()}")
 
 client.connect()
-client.outgoing.put(b"hello!")
+client.send_raw(b"hello!")
 
 input()
 